@@ -20,6 +20,10 @@ from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from typing import Annotated
 from typing_extensions import TypedDict
 import uuid
+import operator
+import re
+import json
+import hashlib
 import requests
 import glob
 from breed_mapping import BREED_FOLDER_MAP
@@ -153,6 +157,17 @@ def normalize_spaces(text):
     """Normalize all types of spaces to regular spaces"""
     return ' '.join(text.split())
 
+def message_text(message) -> str:
+    """Get the user-facing text of an AI message"""
+    content = getattr(message, 'content', None)
+    if isinstance(content, list):
+        return (content[0].get("text") or "") if content else ""
+    return content or ""
+
+def has_text(message) -> bool:
+    """Check whether an AI message carries user-facing text"""
+    return bool(message_text(message).strip())
+
 # Define tools
 def record_user_preference(trait: str, user_response: str) -> str:
     """Record a user's preference for a specific dog trait"""
@@ -195,13 +210,19 @@ def find_dog_breed_matches(
 
 def get_breed_details(breed_name: str) -> str:
     """Get detailed trait information for a specific breed"""
-    breed_name_normalized = normalize_spaces(breed_name)
-    breed_data = df[df['Breed'].apply(normalize_spaces) == breed_name_normalized]
+    entry = BREED_CATALOG.get(breed_slug(breed_name))
     
-    if breed_data.empty:
+    if entry is None:
         return f"I couldn't find specific data for '{breed_name}' in my database."
     
-    breed = breed_data.iloc[0]
+    return entry['payload']['detail_text']
+
+def breed_slug(breed_name: str) -> str:
+    """Convert a breed name to its URL slug, e.g. 'Retrievers (Labrador)' -> 'retrievers-labrador'"""
+    return re.sub(r'[^a-z0-9]+', '-', normalize_spaces(breed_name).lower()).strip('-')
+
+def format_breed_details(breed) -> str:
+    """Format the star rating text for a breed row"""
     result = f"**{breed['Breed']}**\n\n"
     
     for trait in TRAITS:
@@ -210,6 +231,59 @@ def get_breed_details(breed_name: str) -> str:
     
     return result
 
+def render_json(payload: dict) -> dict:
+    """Serialize a payload once and compute its ETag"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return {'payload': payload, 'body': body, 'etag': hashlib.sha1(body).hexdigest()}
+
+def build_breed_catalog():
+    """Pre-render breed detail payloads and the catalog index at dataset load time"""
+    trait_info = pd.read_csv('data/trait_description.csv').set_index('Trait')
+    catalog = {}
+    
+    for _, breed in df.iterrows():
+        name = normalize_spaces(breed['Breed'])
+        slug = breed_slug(name)
+        traits = []
+        for trait, info in trait_info.iterrows():
+            # Rated traits carry a 1-5 'value'; descriptive ones (Coat Type, Coat Length) a 'category'
+            entry = {
+                'trait': trait,
+                'description': info['Description']
+            }
+            if pd.api.types.is_integer_dtype(df[trait]):
+                entry['value'] = int(breed[trait])
+                entry['low_label'] = info['Trait_1']
+                entry['high_label'] = info['Trait_5']
+            else:
+                entry['category'] = str(breed[trait])
+            traits.append(entry)
+        catalog[slug] = render_json({
+            'success': True,
+            'breed': name,
+            'slug': slug,
+            'trait_vector': {trait: int(breed[trait]) for trait in TRAITS},
+            'traits': traits,
+            'image_url': get_breed_image_url(name),
+            'detail_text': format_breed_details(breed)
+        })
+    
+    index = render_json({
+        'success': True,
+        'breeds': [
+            {
+                'breed': entry['payload']['breed'],
+                'slug': slug,
+                'image_url': entry['payload']['image_url'],
+                'url': f"/api/breeds/{slug}"
+            }
+            for slug, entry in catalog.items()
+        ]
+    })
+    return catalog, index
+
+BREED_CATALOG, BREED_INDEX = build_breed_catalog()
+
 # System prompt - exact copy from CLI
 SYSTEM_PROMPT = """You are Anna, a friendly and enthusiastic dog matchmaker! 🐾
 
@@ -278,6 +352,12 @@ SYSTEM_PROMPT = """You are Anna, a friendly and enthusiastic dog matchmaker! 
 - Call it like: find_dog_breed_matches(affectionate_with_family=5, good_with_young_children=3, ...)
 - Show results and STOP - don't ask more questions
 
+**Recording Preferences (record_user_preference):**
+- The text you send together with record_user_preference is your COMPLETE reply - you will NOT get another turn after it
+- So that text MUST already include the next trait question (e.g. "Got it! 🐾 Do you have young children at home?")
+- NEVER send only a preamble like "Got it!" or "Perfect, let me find your matches!" with record_user_preference
+- When the answer gives you the 8th trait, call find_dog_breed_matches IN THE SAME MESSAGE as record_user_preference
+
 **CRITICAL: NEVER REPEAT QUESTIONS YOU'VE ALREADY ASKED**
 - Before asking a question, CHECK THE ENTIRE CONVERSATION HISTORY
 - If you already asked about "affectionate", DON'T ask again
@@ -322,9 +402,15 @@ from langchain_core.prompts import ChatPromptTemplate
 from typing import TypedDict, Annotated
 from langgraph.graph.message import add_messages
 
-# Define state (same as CLI)
+def merge_preferences(left: dict, right: dict) -> dict:
+    """Reducer that keeps the latest response recorded for each trait"""
+    return {**(left or {}), **(right or {})}
+
+# Define state (same as CLI, plus preferences recorded in-graph)
 class DogMatcherState(TypedDict):
     messages: Annotated[list, add_messages]
+    preferences: Annotated[dict, merge_preferences]
+    llm_calls_saved: Annotated[int, operator.add]
 
 llm = AzureChatOpenAI(
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
@@ -345,6 +431,10 @@ assistant_prompt = ChatPromptTemplate.from_messages([
 ])
 
 from langgraph.prebuilt import ToolNode
+from langchain_core.runnables import RunnableConfig
+
+# Tools resolved directly as state updates instead of being executed as tool calls
+LOCAL_TOOLS = ['record_user_preference']
 
 # Assistant class (same as CLI)
 class Assistant:
@@ -354,20 +444,72 @@ class Assistant:
     def __call__(self, state: DogMatcherState):
         while True:
             result = self.runnable.invoke(state)
-            if not result.tool_calls and (
-                not result.content or 
-                isinstance(result.content, list) and not result.content[0].get("text")
-            ):
+            if not result.tool_calls and not has_text(result):
                 messages = state["messages"] + [("user", "Please respond to the user.")]
                 state = {**state, "messages": messages}
             else:
                 break
         return {"messages": result}
 
+def is_valid_preference(tool_call) -> bool:
+    """True when a tool call records a preference with both a trait and a response"""
+    args = tool_call.get("args") or {}
+    return tool_call["name"] in LOCAL_TOOLS and bool(args.get("trait")) and bool(args.get("user_response"))
+
+def preferences_only(message) -> bool:
+    """True when every tool call validly records a preference and the reply already asks the next question"""
+    return bool(message.tool_calls) and "?" in message_text(message) and all(
+        is_valid_preference(call) for call in message.tool_calls
+    )
+
+# Tools node: records preferences in-graph, delegates the other tools to ToolNode
+class PreferenceToolNode:
+    def __init__(self, tools):
+        self.tool_node = ToolNode(tools)
+    
+    def __call__(self, state: DogMatcherState, config: RunnableConfig):
+        last_message = state["messages"][-1]
+        preferences = {}
+        outputs = {}
+        pending = []
+        for tool_call in last_message.tool_calls:
+            if tool_call["name"] not in LOCAL_TOOLS:
+                pending.append(tool_call)
+            elif is_valid_preference(tool_call):
+                trait = tool_call["args"]["trait"]
+                user_response = tool_call["args"]["user_response"]
+                preferences[trait] = user_response
+                outputs[tool_call["id"]] = ToolMessage(
+                    content=record_user_preference(trait, user_response),
+                    name=tool_call["name"],
+                    tool_call_id=tool_call["id"]
+                )
+            else:
+                outputs[tool_call["id"]] = ToolMessage(
+                    content=f"Error: {tool_call['name']} requires both 'trait' and 'user_response'.\n Please fix your mistakes.",
+                    name=tool_call["name"],
+                    tool_call_id=tool_call["id"]
+                )
+        
+        if pending:
+            # ToolNode validates arguments against the tool schemas and runs the calls concurrently
+            result = self.tool_node.invoke(
+                {"messages": [AIMessage(content="", tool_calls=pending, id=last_message.id)]},
+                config
+            )
+            for message in result["messages"]:
+                outputs[message.tool_call_id] = message
+        
+        return {
+            "messages": [outputs[tool_call["id"]] for tool_call in last_message.tool_calls],
+            "preferences": preferences,
+            "llm_calls_saved": 1 if preferences_only(last_message) else 0
+        }
+
 # Build graph (exact same as CLI)
 builder = StateGraph(DogMatcherState)
 builder.add_node("assistant", Assistant(assistant_prompt | llm_with_tools))
-builder.add_node("tools", ToolNode(tools))
+builder.add_node("tools", PreferenceToolNode(tools))
 builder.add_edge("__start__", "assistant")
 
 def should_continue(state: DogMatcherState):
@@ -378,7 +520,15 @@ def should_continue(state: DogMatcherState):
     return "__end__"
 
 builder.add_conditional_edges("assistant", should_continue, ["tools", "__end__"])
-builder.add_edge("tools", "assistant")
+
+def after_tools(state: DogMatcherState):
+    # The assistant already asked the next question alongside its preference calls - no need to generate again
+    last_ai_message = next(m for m in reversed(state["messages"]) if isinstance(m, AIMessage))
+    if preferences_only(last_ai_message):
+        return "__end__"
+    return "assistant"
+
+builder.add_conditional_edges("tools", after_tools, ["assistant", "__end__"])
 
 memory = MemorySaver()
 graph = builder.compile(checkpointer=memory, debug=False)
@@ -414,6 +564,8 @@ def chat():
         # Track printed messages to avoid duplicates
         printed_contents = set()
         ai_response = ""
+        llm_calls_saved = 0
+        preferences = {}
         
         # Stream through the graph exactly like CLI
         for event in graph.stream(
@@ -421,6 +573,8 @@ def chat():
             config,
             stream_mode="values"
         ):
+            llm_calls_saved = event.get("llm_calls_saved", llm_calls_saved)
+            preferences = event.get("preferences", preferences)
             if "messages" in event:
                 last_message = event["messages"][-1]
                 
@@ -441,11 +595,14 @@ def chat():
             ai_response = "Hi there! 🐾 I'm Anna, your friendly dog breed matching assistant! Let's find your perfect furry companion. To start, how important is it that your dog is affectionate with family? 😊"
         
         print(f"🤖 Anna's response: {ai_response[:100]}...")
+        print(f"📉 LLM generations saved this conversation: {llm_calls_saved}")
         
         return jsonify({
             'success': True,
             'response': ai_response,
-            'session_id': session_id  # Send back to client
+            'session_id': session_id,  # Send back to client
+            'llm_calls_saved': llm_calls_saved,
+            'preferences': preferences
         })
     
     except Exception as e:
@@ -476,6 +633,7 @@ def breed_images():
         for i, breed in enumerate(breeds):
             results.append({
                 'breed': breed,
+                'slug': breed_slug(breed),
                 'score': scores[i] if i < len(scores) else 0,
                 'image_url': get_breed_image_url(breed),
                 'rank': i + 1
@@ -491,6 +649,32 @@ def breed_images():
             'error': str(e)
         }), 500
 
+# Breed catalog is static per deploy, so let CDNs and browsers cache it
+BREED_CACHE_CONTROL = os.environ.get('BREED_CACHE_CONTROL', 'public, max-age=3600, stale-while-revalidate=86400')
+
+def cached_json_response(entry):
+    """Serve a pre-rendered payload with ETag and Cache-Control, answering 304 when unchanged"""
+    response = app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = BREED_CACHE_CONTROL
+    return response.make_conditional(request)
+
+@app.route('/api/breeds', methods=['GET'])
+def breeds():
+    """List all breeds in the catalog"""
+    return cached_json_response(BREED_INDEX)
+
+@app.route('/api/breeds/<slug>', methods=['GET'])
+def breed_detail(slug):
+    """Get the pre-rendered detail payload for a single breed"""
+    entry = BREED_CATALOG.get(breed_slug(slug))
+    if entry is None:
+        return jsonify({
+            'success': False,
+            'error': f"Breed '{slug}' not found"
+        }), 404
+    return cached_json_response(entry)
+
 if __name__ == '__main__':
     # Use port from environment variable for Azure, default to 5001 for local
     port = int(os.environ.get('PORT', 5001))